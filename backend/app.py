@@ -1,44 +1,113 @@
-import json
+import asyncio
+import logging
 import os
-import subprocess
-import sys
-from fastapi import FastAPI, HTTPException
+from pathlib import Path
+from fastapi import FastAPI, HTTPException, Request, Response
 from fastapi.responses import HTMLResponse
 from fastapi.staticfiles import StaticFiles
 
+from backend.logic import run_pipeline
+
 app = FastAPI()
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-PROJECT_ROOT = os.path.abspath(os.path.join(BASE_DIR, ".."))
 FRONTEND_DIST = os.path.abspath(os.path.join(BASE_DIR, "..", "frontend", "dist"))
+MEMBERS_PATH = os.path.join(BASE_DIR, "data", "members.csv")
+VISITS_PATH = os.path.join(BASE_DIR, "data", "visits.csv")
+OUTPUT_PATH = os.path.join(BASE_DIR, "data", "output.csv")
 SUMMARY_PATH = os.path.join(BASE_DIR, "data", "summary.json")
-PROCESSOR_PATH = os.path.join(BASE_DIR, "processor.py")
+
+
+# Last summary.json served as one (key, body) tuple, key = (mtime_ns, size), so repeated polls
+# skip the file read. Always replaced in a single assignment, never mutated in place.
+_summary_cache = (None, b"")
+
+
+def summary_etag(key):
+    # summary.json only changes when the processor runs, so its mtime+size is a cheap ETag.
+    mtime_ns, size = key
+    return f'W/"{mtime_ns:x}-{size:x}"'
+
+
+def etag_matches(if_none_match, etag):
+    # If-None-Match may be "*" or a comma-separated list; it uses weak comparison.
+    if if_none_match is None:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or any(c.removeprefix("W/") == etag.removeprefix("W/") for c in candidates)
 
 
 @app.get("/api/result")
-def get_result():
-    if not os.path.exists(SUMMARY_PATH):
+def get_result(request: Request):
+    try:
+        st = os.stat(SUMMARY_PATH)
+    except FileNotFoundError:
         raise HTTPException(status_code=404, detail="summary.json not found. Run the processor first.")
-    with open(SUMMARY_PATH, encoding="utf-8") as f:
-        return json.load(f)
+
+    key = (st.st_mtime_ns, st.st_size)
+    if etag_matches(request.headers.get("if-none-match"), summary_etag(key)):
+        return Response(status_code=304, headers={"ETag": summary_etag(key), "Cache-Control": "no-cache"})
+
+    global _summary_cache
+    cached = _summary_cache
+    if cached[0] != key:
+        # fstat the opened file so the key (and ETag) always describes the bytes actually read,
+        # even if a newer summary.json replaced the one stat-ed above.
+        with open(SUMMARY_PATH, "rb") as f:
+            opened = os.fstat(f.fileno())
+            cached = ((opened.st_mtime_ns, opened.st_size), f.read())
+        _summary_cache = cached
+
+    key, body = cached
+    headers = {"ETag": summary_etag(key), "Cache-Control": "no-cache"}
+    # The file is already JSON, so serve the bytes as-is instead of decoding and re-encoding.
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+# The pipeline run currently in flight, shared by concurrent /api/run callers.
+_run_task = None
 
 
 @app.post("/api/run")
-def run_processor():
-  result = subprocess.run(
-    [sys.executable, PROCESSOR_PATH],
-    cwd=PROJECT_ROOT,
-    capture_output=True,
-    text=True,
-  )
-  if result.returncode != 0:
-    detail = result.stderr.strip() or "Processor failed. Check server logs for details."
-    raise HTTPException(status_code=500, detail=detail)
-  return {"ok": True}
+async def run_processor():
+    global _run_task
+    # Run the pipeline in-process on a worker thread: no interpreter start-up per call,
+    # and the event loop stays free while the CSVs are processed.
+    # Concurrent callers join the in-flight run instead of starting another one that would
+    # write to the same output files. Check-and-create has no await in between, so it is
+    # atomic on the event loop and needs no lock.
+    if _run_task is None or _run_task.done():
+        _run_task = asyncio.create_task(
+            asyncio.to_thread(run_pipeline, MEMBERS_PATH, VISITS_PATH, OUTPUT_PATH, SUMMARY_PATH)
+        )
+    try:
+        # Shielded so one client disconnecting does not cancel the run for the others.
+        await asyncio.shield(_run_task)
+    except Exception as exc:
+        logging.exception("Processor failed.")
+        raise HTTPException(status_code=500, detail=str(exc) or "Processor failed. Check server logs for details.")
+    return {"ok": True}
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles with Cache-Control headers for the Vite build.
+    Files under assets/ are content-hashed by Vite, so they never change and can be cached for good;
+    everything else (index.html) is revalidated via the ETag StaticFiles already sends.
+    """
+
+    async def get_response(self, path, scope):
+        response = await super().get_response(path, scope)
+        # path is OS-normalized by StaticFiles (assets\x.js on Windows), so compare path parts.
+        if Path(path).parts[:1] == ("assets",):
+            response.headers["Cache-Control"] = "public, max-age=31536000, immutable"
+        else:
+            response.headers["Cache-Control"] = "no-cache"
+        return response
 
 
 if os.path.exists(FRONTEND_DIST):
-    app.mount("/", StaticFiles(directory=FRONTEND_DIST, html=True), name="static")
+    app.mount("/", CachedStaticFiles(directory=FRONTEND_DIST, html=True), name="static")
 else:
 
     @app.get("/")
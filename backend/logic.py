@@ -22,21 +22,40 @@ Run:
 from __future__ import annotations
 
 import csv
+import heapq
 import json
 import logging
-from collections import defaultdict
-from dataclasses import dataclass
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
 from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, List, Optional, Tuple
+from typing import Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+try:  # optional speed-up, installed via requirements.txt; the CLI works without it
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# ----------------------------------------------------------------------------------------
+# I/O settings
+# ----------------------------------------------------------------------------------------
+
+# The umask can only be read by setting it, so read it once at import time rather than from
+# the server's worker threads. Used to give atomically written files the mode open("w") would.
+PROCESS_UMASK = os.umask(0)
+os.umask(PROCESS_UMASK)
 
 
 # ----------------------------------------------------------------------------------------
 # Data models
 # ----------------------------------------------------------------------------------------
 
-@dataclass(frozen=True)
-class Visit:
+class Visit(NamedTuple):
+    # A NamedTuple instead of a frozen dataclass: no per-instance __dict__, so each row is a
+    # plain tuple (smaller and cheaper to build), while keeping the same fields and constructor.
     visit_id: str
     barcode: str
     reservation_id: Optional[str]
@@ -45,6 +64,33 @@ class Visit:
 # ----------------------------------------------------------------------------------------
 # Core functions
 # ----------------------------------------------------------------------------------------
+def resolve_columns(
+    header: List[str],
+    path: Path,
+    required: Tuple[str, ...],
+    optional: Tuple[str, ...] = (),
+) -> List[int]:
+    """
+    Map column names to their positions in the CSV header, in the order required + optional.
+    Names are compared after stripping whitespace and a UTF-8 BOM. Missing optional columns
+    resolve to -1; a missing required column raises a ValueError naming the file and column.
+    """
+    names = [name.strip().lstrip("\ufeff").strip() for name in header]
+    missing = [column for column in required if column not in names]
+    if missing:
+        raise ValueError(
+            f"{path.name} is missing required column(s): {', '.join(missing)} (header: {header!r})"
+        )
+    return [names.index(column) if column in names else -1 for column in required + optional]
+
+
+def cell_value(row: List[str], index: int) -> str:
+    """
+    Stripped value at index, or "" when the column is absent (-1) or the row is too short.
+    """
+    return row[index].strip() if 0 <= index < len(row) else ""
+
+
 def load_members(file_path: str | Path) -> Dict[str, str]:
     """
     Load members.csv into a mapping: barcode -> member_id
@@ -54,12 +100,26 @@ def load_members(file_path: str | Path) -> Dict[str, str]:
     barcode_to_member: Dict[str, str] = {}
 
     with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+
+        # Resolve column positions once from the header instead of building a dict per row.
+        header = next(reader, None)
+        if header is None:  # empty file
+            return barcode_to_member
+        mi, bi = resolve_columns(header, path, ("member_id", "barcode"))
+        width = max(mi, bi)
 
         # For each row, we check that member_id and barcode are present, non-empty and unique.
         for line_no, row in enumerate(reader, start=2):  # header is line 1
-            member_id = (row.get("member_id") or "").strip()
-            barcode = (row.get("barcode") or "").strip()
+            if not row:  # blank line: skip silently, it is not an invalid row
+                continue
+
+            if len(row) > width:
+                member_id = row[mi].strip()
+                barcode = row[bi].strip()
+            else:
+                member_id = cell_value(row, mi)
+                barcode = cell_value(row, bi)
 
             if not member_id or not barcode:
                 logging.warning(
@@ -81,23 +141,39 @@ def load_members(file_path: str | Path) -> Dict[str, str]:
     return barcode_to_member
 
 
-def load_visits(file_path: str | Path) -> List[Visit]:
+def iter_visits(file_path: str | Path) -> Iterator[Visit]:
     """
-    Load visits.csv into a list[Visit].
+    Lazily yield Visit rows from visits.csv, one at a time.
 
     We do not fully validate here (that happens in validate_and_group_visits),
     but we normalize whitespace and treat empty reservation_id as None.
+    Streaming the rows lets the grouping step run without holding every visit in memory.
     """
     path = Path(file_path)
-    visits: List[Visit] = []
 
     with path.open("r", newline="", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
+        reader = csv.reader(f)
+
+        header = next(reader, None)
+        if header is None:  # empty file
+            return
+        # reservation_id is optional: without the column every visit is a walk-in.
+        vi, bi, ri = resolve_columns(header, path, ("visit_id", "barcode"), ("reservation_id",))
+        width = max(vi, bi, ri)
 
         for line_no, row in enumerate(reader, start=2): # header is line 1 again
-            visit_id = (row.get("visit_id") or "").strip()
-            barcode = (row.get("barcode") or "").strip()
-            reservation_id = ((row.get("reservation_id") or "").strip()) or None
+            if not row:  # blank line: skip silently, it is not an invalid row
+                continue
+
+            if len(row) > width:
+                visit_id = row[vi].strip()
+                barcode = row[bi].strip()
+                reservation_id = (row[ri].strip() if ri >= 0 else "") or None
+            else:
+                # Short rows keep whatever columns are present, like DictReader did.
+                visit_id = cell_value(row, vi)
+                barcode = cell_value(row, bi)
+                reservation_id = cell_value(row, ri) or None
 
             if not visit_id:
                 logging.warning(
@@ -106,14 +182,19 @@ def load_visits(file_path: str | Path) -> List[Visit]:
                 )
                 continue
 
-            visits.append(Visit(visit_id=visit_id, barcode=barcode, reservation_id=reservation_id))
+            yield Visit(visit_id=visit_id, barcode=barcode, reservation_id=reservation_id)
+
 
-    return visits
+def load_visits(file_path: str | Path) -> List[Visit]:
+    """
+    Load visits.csv into a list[Visit]. See iter_visits for the normalization rules.
+    """
+    return list(iter_visits(file_path))
 
 
 def validate_and_group_visits(
     members: Dict[str, str],
-    visits: List[Visit],
+    visits: Iterable[Visit],
 ) -> Tuple[Dict[Tuple[str, str], List[str]], int]:
     """
     Apply validation rules:
@@ -126,31 +207,68 @@ def validate_and_group_visits(
       grouped_data: dict[(member_id, barcode)] -> [visit_id, ...]
       walk_in_count: number of valid visits where reservation_id is missing
     """
-    grouped: Dict[Tuple[str, str], List[str]] = defaultdict(list)
+    # members maps each barcode to exactly one member, so the barcode alone identifies a
+    # (member_id, barcode) group. Bucketing by the barcode string avoids allocating and hashing
+    # a key tuple per visit; tuples are only built once per group when returning.
+    by_barcode: Dict[str, List[str]] = {}
     walk_in_count = 0
+    lookup_member = members.get
 
-    for v in visits:
-        if not v.barcode:
+    # Visit is a tuple, so unpacking it once is cheaper than repeated attribute lookups.
+    for visit_id, barcode, reservation_id in visits:
+        if not barcode:
             logging.warning(
                 "Invalid visit (missing barcode) excluded. visit_id=%s",
-                v.visit_id
+                visit_id
             )
             continue
 
-        member_id = members.get(v.barcode)
-        if not member_id:
+        if not lookup_member(barcode):
             logging.warning(
                 "Invalid visit (unknown barcode) excluded. visit_id=%s barcode=%s",
-                v.visit_id, v.barcode
+                visit_id, barcode
             )
             continue
 
-        grouped[(member_id, v.barcode)].append(v.visit_id)
+        visit_ids = by_barcode.get(barcode)
+        if visit_ids is None:
+            by_barcode[barcode] = [visit_id]
+        else:
+            visit_ids.append(visit_id)
 
-        if v.reservation_id is None:
+        if reservation_id is None:
             walk_in_count += 1
 
-    return dict(grouped), walk_in_count
+    grouped = {
+        (members[barcode], barcode): visit_ids
+        for barcode, visit_ids in by_barcode.items()
+    }
+    return grouped, walk_in_count
+
+
+@contextmanager
+def atomic_write_path(path: Path) -> Iterator[Path]:
+    """
+    Yield a fresh temp file next to path; on success it is renamed over path with os.replace,
+    so readers (e.g. /api/result) see either the old or the new file, never a partial one.
+    Each writer gets its own mkstemp name, so a CLI run and a server run cannot write into the
+    same temp file. On failure the temp file is removed and path is left untouched.
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name + ".", suffix=".tmp")
+    os.close(fd)
+    tmp_path = Path(tmp_name)
+    try:
+        yield tmp_path
+        # mkstemp creates the file as 0600; keep the target's mode, or use what open("w") would give.
+        if path.exists():
+            shutil.copymode(path, tmp_path)
+        else:
+            os.chmod(tmp_path, 0o666 & ~PROCESS_UMASK)
+        os.replace(tmp_path, path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
 
 def write_output(file_path: str | Path, grouped_data: Dict[Tuple[str, str], List[str]]) -> None:
@@ -159,38 +277,52 @@ def write_output(file_path: str | Path, grouped_data: Dict[Tuple[str, str], List
       member_id,barcode,[visit_id1, visit_id2, ...]
     """
     path = Path(file_path)
-    path.parent.mkdir(parents=True, exist_ok=True)
 
-    with path.open("w", newline="", encoding="utf-8") as f:
-        f.write("member_id,barcode,visits\n")
+    with atomic_write_path(path) as tmp_path:
+        with tmp_path.open("w", newline="", encoding="utf-8") as f:
+            f.write("member_id,barcode,visits\n")
 
-        # Stable ordering for debugging and tests
-        for member_id, barcode in sorted(grouped_data):
-            visit_ids = grouped_data[(member_id, barcode)]
-            visits_repr = "[" + ", ".join(visit_ids) + "]"
-            f.write(f"{member_id},{barcode},{visits_repr}\n")
+            # Stable ordering for debugging and tests. Sorting the items (keys are unique, so the
+            # visit lists are never compared) avoids re-looking up each group in the dict.
+            # writelines consumes the generator in one call, keeping memory bounded.
+            f.writelines(
+                member_id + "," + barcode + ",[" + ", ".join(visit_ids) + "]\n"
+                for (member_id, barcode), visit_ids in sorted(grouped_data.items())
+            )
 
 
-def print_top_members(grouped_data: Dict[Tuple[str, str], List[str]], top_n: int = 5) -> None:
-    """
-    Bonus: Print top N members by number of visits. Top 5 are asked for, but make it configurable.
-    Each line: member_id, amount_of_visits
+def count_visits_per_member(
+    grouped_data: Dict[Tuple[str, str], List[str]],
+) -> Tuple[Dict[str, int], int]:
     """
-    visits_per_member: Dict[str, int] = defaultdict(int)
+    Single pass over the grouped data; the totals feed build_summary.
 
-    print("--------------------------------------------")
-    print(f"Top {top_n} members by visits:")
+    Returns:
+      visits_per_member: dict[member_id] -> number of valid visits
+      total_valid_visits: number of valid visits across all members
+    """
+    visits_per_member: Dict[str, int] = {}
+    total_valid_visits = 0
 
     for (member_id, _barcode), visit_ids in grouped_data.items():
-        visits_per_member[member_id] += len(visit_ids)
+        count = len(visit_ids)
+        visits_per_member[member_id] = visits_per_member.get(member_id, 0) + count
+        total_valid_visits += count
+
+    return visits_per_member, total_valid_visits
 
-    ranking = sorted(
-        visits_per_member.items(),
-        key=lambda item: (-item[1], item[0])  # desc by count, then member_id
-    )[:top_n]
 
-    for member_id, count in ranking:
-        print(f"{member_id}, {count}")
+def print_top_members(top_members: List[Dict[str, object]]) -> None:
+    """
+    Bonus: Print the top members by number of visits (how many is set by build_summary's top_n).
+    Takes the already ranked summary["top_members"] so the ranking is only computed once.
+    Each line: member_id, amount_of_visits
+    """
+    print("--------------------------------------------")
+    print(f"Top {len(top_members)} members by visits:")
+
+    for member in top_members:
+        print(f"{member['member_id']}, {member['visit_count']}")
     print("--------------------------------------------")
 
 
@@ -206,22 +338,17 @@ def print_total_walk_ins(walk_in_count: int) -> None:
 
 def build_summary(
     *,
-    grouped_data: Dict[Tuple[str, str], List[str]],
+    visits_per_member: Dict[str, int],
+    total_valid_visits: int,
     walk_in_count: int,
     top_n: int = 5,
 ) -> Dict[str, object]:
-    visits_per_member: Dict[str, int] = defaultdict(int)
-    total_valid_visits = 0
-
-    for (member_id, _barcode), visit_ids in grouped_data.items():
-        count = len(visit_ids)
-        visits_per_member[member_id] += count
-        total_valid_visits += count
-
-    top_members = sorted(
+    # Bounded heap: O(M log top_n) instead of sorting every member just to keep a few.
+    top_members = heapq.nsmallest(
+        top_n,
         visits_per_member.items(),
-        key=lambda item: (-item[1], item[0]),
-    )[:top_n]
+        key=lambda item: (-item[1], item[0]),  # desc by count, then member_id
+    )
 
     return {
         "generated_at": datetime.now(timezone.utc).isoformat(),
@@ -236,6 +363,43 @@ def build_summary(
 
 def write_summary(file_path: str | Path, summary: Dict[str, object]) -> None:
     path = Path(file_path)
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as f:
-        json.dump(summary, f, indent=2)
+    with atomic_write_path(path) as tmp_path:
+        if orjson is not None:
+            # orjson serializes straight to bytes in C; /api/result serves these bytes unchanged.
+            tmp_path.write_bytes(orjson.dumps(summary, option=orjson.OPT_INDENT_2))
+        else:
+            with tmp_path.open("w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+
+
+def run_pipeline(
+    members_path: str | Path,
+    visits_path: str | Path,
+    output_path: str | Path,
+    summary_path: str | Path,
+    *,
+    top_n: int = 5,
+) -> Dict[str, object]:
+    """
+    Run the full report: load and validate the inputs, write output.csv and summary.json.
+    Shared by the CLI (processor.py) and the FastAPI /api/run endpoint.
+
+    Returns the summary that was written.
+    """
+    members = load_members(members_path)
+    # Visits are streamed straight into the group-by; no intermediate list is built.
+    visits = iter_visits(visits_path)
+
+    grouped_data, walk_in_count = validate_and_group_visits(members, visits)
+    write_output(output_path, grouped_data)
+
+    visits_per_member, total_valid_visits = count_visits_per_member(grouped_data)
+    summary = build_summary(
+        visits_per_member=visits_per_member,
+        total_valid_visits=total_valid_visits,
+        walk_in_count=walk_in_count,
+        top_n=top_n,
+    )
+    write_summary(summary_path, summary)
+
+    return summary
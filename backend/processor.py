@@ -2,14 +2,9 @@ import argparse
 import logging
 
 from logic import (
-    build_summary,
-    load_members,
-    load_visits,
     print_top_members,
     print_total_walk_ins,
-    validate_and_group_visits,
-    write_output,
-    write_summary,
+    run_pipeline,
 )
 
 
@@ -53,21 +48,17 @@ def main() -> int:
         format="%(levelname)s: %(message)s",
     )
 
-    members = load_members(args.members)
-    visits = load_visits(args.visits)
-    grouped_data, walk_in_count = validate_and_group_visits(members, visits)
-
-    write_output(args.output, grouped_data)
-    summary = build_summary(
-        grouped_data=grouped_data,
-        walk_in_count=walk_in_count,
+    summary = run_pipeline(
+        args.members,
+        args.visits,
+        args.output,
+        args.summary,
         top_n=5,
     )
-    write_summary(args.summary, summary)
 
     # Bonus outputs
-    print_top_members(grouped_data, top_n=5)
-    print_total_walk_ins(walk_in_count)
+    print_top_members(summary["top_members"])
+    print_total_walk_ins(summary["total_walk_ins"])
 
     return 0
 
@@ -0,0 +1,140 @@
+import asyncio
+import os
+import threading
+import time
+
+import httpx
+from fastapi import FastAPI
+
+import backend.app as app_module
+
+
+def send_requests(*requests):
+    async def send_all():
+        transport = httpx.ASGITransport(app=app_module.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await asyncio.gather(
+                *(client.request(method, url, headers=headers) for method, url, headers in requests)
+            )
+
+    return asyncio.run(send_all())
+
+
+def post_run_concurrently(count):
+    return send_requests(*[("POST", "/api/run", None)] * count)
+
+
+def get_result(headers=None):
+    (response,) = send_requests(("GET", "/api/result", headers))
+    return response
+
+
+def install_slow_pipeline(monkeypatch, error=None):
+    calls = []
+    lock = threading.Lock()
+
+    def slow_pipeline(*args, **kwargs):
+        with lock:
+            calls.append(args)
+        time.sleep(0.2)
+        if error is not None:
+            raise error
+        return {}
+
+    monkeypatch.setattr(app_module, "run_pipeline", slow_pipeline)
+    monkeypatch.setattr(app_module, "_run_task", None)
+    return calls
+
+
+def test_concurrent_runs_share_one_pipeline_run(monkeypatch):
+    calls = install_slow_pipeline(monkeypatch)
+
+    responses = post_run_concurrently(5)
+
+    assert [r.status_code for r in responses] == [200] * 5
+    assert all(r.json() == {"ok": True} for r in responses)
+    assert len(calls) == 1
+
+
+def test_failed_run_returns_500_to_every_caller(monkeypatch):
+    calls = install_slow_pipeline(monkeypatch, error=ValueError("members.csv is missing required column(s): barcode"))
+
+    responses = post_run_concurrently(3)
+
+    assert [r.status_code for r in responses] == [500] * 3
+    assert all("missing required column" in r.json()["detail"] for r in responses)
+    assert len(calls) == 1
+
+
+def test_new_run_starts_after_previous_completed(monkeypatch):
+    calls = install_slow_pipeline(monkeypatch)
+
+    post_run_concurrently(2)
+    post_run_concurrently(2)
+
+    assert len(calls) == 2
+
+
+def test_result_etag_and_not_modified(tmp_path, monkeypatch):
+    summary_path = tmp_path / "summary.json"
+    summary_path.write_text('{"total_walk_ins": 1}', encoding="utf-8")
+    monkeypatch.setattr(app_module, "SUMMARY_PATH", str(summary_path))
+
+    first = get_result()
+    assert first.status_code == 200
+    assert first.json() == {"total_walk_ins": 1}
+    etag = first.headers["etag"]
+
+    cached = get_result({"If-None-Match": etag})
+    assert cached.status_code == 304
+    assert cached.content == b""
+
+    listed = get_result({"If-None-Match": f'"other", {etag}'})
+    assert listed.status_code == 304
+    assert get_result({"If-None-Match": "*"}).status_code == 304
+
+    summary_path.write_text('{"total_walk_ins": 22}', encoding="utf-8")
+    st = summary_path.stat()
+    os.utime(summary_path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000))
+
+    refreshed = get_result({"If-None-Match": etag})
+    assert refreshed.status_code == 200
+    assert refreshed.json() == {"total_walk_ins": 22}
+    assert refreshed.headers["etag"] != etag
+
+
+def test_result_missing_summary_returns_404(tmp_path, monkeypatch):
+    monkeypatch.setattr(app_module, "SUMMARY_PATH", str(tmp_path / "summary.json"))
+
+    assert get_result().status_code == 404
+
+
+def test_static_files_cache_control(tmp_path):
+    (tmp_path / "index.html").write_text("<html></html>", encoding="utf-8")
+    (tmp_path / "assets").mkdir()
+    (tmp_path / "assets" / "x.js").write_text("console.log(1);", encoding="utf-8")
+    static_app = FastAPI()
+    static_app.mount("/", app_module.CachedStaticFiles(directory=tmp_path, html=True), name="static")
+
+    async def fetch_all():
+        transport = httpx.ASGITransport(app=static_app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            responses = {}
+            for url in ("/", "/assets/x.js"):
+                first = await client.get(url)
+                revalidated = await client.get(url, headers={"If-None-Match": first.headers["etag"]})
+                responses[url] = (first, revalidated)
+            return responses
+
+    responses = asyncio.run(fetch_all())
+
+    index, index_revalidated = responses["/"]
+    asset, asset_revalidated = responses["/assets/x.js"]
+    assert index.status_code == 200
+    assert index.headers["cache-control"] == "no-cache"
+    assert index_revalidated.status_code == 304
+    assert index_revalidated.headers["cache-control"] == "no-cache"
+    assert asset.status_code == 200
+    assert asset.headers["cache-control"] == "public, max-age=31536000, immutable"
+    assert asset_revalidated.status_code == 304
+    assert asset_revalidated.headers["cache-control"] == "public, max-age=31536000, immutable"
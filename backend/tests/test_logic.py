@@ -1,12 +1,23 @@
 import csv
+import json
+import logging
+import os
+import stat
 
+import pytest
+
+import backend.logic as logic_module
 from backend.logic import (
     Visit,
     build_summary,
+    count_visits_per_member,
     load_members,
     load_visits,
+    print_top_members,
+    run_pipeline,
     validate_and_group_visits,
     write_output,
+    write_summary,
 )
 
 
@@ -53,6 +64,57 @@ def test_load_visits_skips_missing_visit_id_and_normalizes_reservation(tmp_path)
     assert visits[0].reservation_id is None
 
 
+def test_loaders_return_empty_for_empty_files(tmp_path):
+    members_path = tmp_path / "members.csv"
+    visits_path = tmp_path / "visits.csv"
+    members_path.write_text("", encoding="utf-8")
+    visits_path.write_text("", encoding="utf-8")
+
+    assert load_members(members_path) == {}
+    assert load_visits(visits_path) == []
+
+
+def test_load_visits_without_reservation_column_treats_all_as_walk_ins(tmp_path):
+    visits_path = tmp_path / "visits.csv"
+    write_csv(visits_path, ["visit_id", "barcode"], [["v1", "b1"], ["v2", "b1"]])
+
+    visits = load_visits(visits_path)
+
+    assert [v.reservation_id for v in visits] == [None, None]
+    _grouped, walkins = validate_and_group_visits({"b1": "m1"}, visits)
+    assert walkins == 2
+
+
+def test_loaders_skip_blank_lines_without_warnings(tmp_path, caplog):
+    members_path = tmp_path / "members.csv"
+    visits_path = tmp_path / "visits.csv"
+    members_path.write_text("member_id,barcode\nm1,b1\n\nm2,b2\n\n", encoding="utf-8")
+    visits_path.write_text("visit_id,barcode,reservation_id\n\nv1,b1,r1\n\n", encoding="utf-8")
+
+    with caplog.at_level(logging.WARNING):
+        members = load_members(members_path)
+        visits = load_visits(visits_path)
+
+    assert members == {"b1": "m1", "b2": "m2"}
+    assert [v.visit_id for v in visits] == ["v1"]
+    assert caplog.records == []
+
+
+def test_load_members_accepts_bom_and_padded_header(tmp_path):
+    members_path = tmp_path / "members.csv"
+    members_path.write_text("\ufeffmember_id, barcode\nm1,b1\n", encoding="utf-8")
+
+    assert load_members(members_path) == {"b1": "m1"}
+
+
+def test_load_members_missing_required_column_raises_clear_error(tmp_path):
+    members_path = tmp_path / "members.csv"
+    write_csv(members_path, ["member_id", "card"], [["m1", "b1"]])
+
+    with pytest.raises(ValueError, match="members.csv is missing required column\\(s\\): barcode"):
+        load_members(members_path)
+
+
 def test_validate_and_group_visits_and_walkins():
     members = {"b1": "m1"}
     visits = [
@@ -67,6 +129,25 @@ def test_validate_and_group_visits_and_walkins():
     assert walkins == 1
 
 
+def test_validate_and_group_visits_keeps_visit_order_per_member_barcode():
+    members = {"b1": "m1", "b2": "m1", "b3": "m2"}
+    visits = [
+        Visit(visit_id="v1", barcode="b1", reservation_id="r1"),
+        Visit(visit_id="v2", barcode="b2", reservation_id="r2"),
+        Visit(visit_id="v3", barcode="b1", reservation_id=None),
+        Visit(visit_id="v4", barcode="b3", reservation_id=None),
+    ]
+
+    grouped, walkins = validate_and_group_visits(members, visits)
+
+    assert grouped == {
+        ("m1", "b1"): ["v1", "v3"],
+        ("m1", "b2"): ["v2"],
+        ("m2", "b3"): ["v4"],
+    }
+    assert walkins == 2
+
+
 def test_write_output_format(tmp_path):
     output_path = tmp_path / "output.csv"
     grouped = {("m1", "b1"): ["v1", "v2"]}
@@ -76,31 +157,132 @@ def test_write_output_format(tmp_path):
     content = output_path.read_text(encoding="utf-8").strip().splitlines()
     assert content[0] == "member_id,barcode,visits"
     assert content[1] == "m1,b1,[v1, v2]"
+    assert [p.name for p in tmp_path.iterdir()] == ["output.csv"]
+
+
+def test_write_output_failure_keeps_previous_file_and_no_temp(tmp_path):
+    output_path = tmp_path / "output.csv"
+    output_path.write_text("previous\n", encoding="utf-8")
+
+    with pytest.raises(TypeError):
+        write_output(output_path, {("m1", "b1"): ["v1", None]})
+
+    assert output_path.read_text(encoding="utf-8") == "previous\n"
+    assert [p.name for p in tmp_path.iterdir()] == ["output.csv"]
+
+
+def test_write_output_keeps_existing_mode_and_uses_umask_for_new_files(tmp_path):
+    existing_path = tmp_path / "existing.csv"
+    existing_path.write_text("previous\n", encoding="utf-8")
+    os.chmod(existing_path, 0o640)
+    new_path = tmp_path / "new.csv"
+
+    write_output(existing_path, {("m1", "b1"): ["v1"]})
+    write_output(new_path, {("m1", "b1"): ["v1"]})
+
+    assert stat.S_IMODE(existing_path.stat().st_mode) == 0o640
+    assert stat.S_IMODE(new_path.stat().st_mode) == 0o666 & ~logic_module.PROCESS_UMASK
+
+
+def test_count_visits_per_member_sums_across_barcodes():
+    grouped = {
+        ("m1", "b1"): ["v1", "v2"],
+        ("m1", "b3"): ["v4"],
+        ("m2", "b2"): ["v3"],
+    }
+
+    visits_per_member, total_valid_visits = count_visits_per_member(grouped)
+
+    assert visits_per_member == {"m1": 3, "m2": 1}
+    assert total_valid_visits == 4
 
 
 def test_build_summary_includes_bonus_fields():
-    members = {"b1": "m1", "b2": "m2"}
-    visits = [
-        Visit(visit_id="v1", barcode="b1", reservation_id=None),
-        Visit(visit_id="v2", barcode="b1", reservation_id="r2"),
-        Visit(visit_id="v3", barcode="b2", reservation_id=None),
-    ]
     grouped = {
         ("m1", "b1"): ["v1", "v2"],
         ("m2", "b2"): ["v3"],
     }
+    visits_per_member, total_valid_visits = count_visits_per_member(grouped)
 
     summary = build_summary(
-        members_path="members.csv",
-        visits_path="visits.csv",
-        output_path="output.csv",
-        members=members,
-        visits=visits,
-        grouped_data=grouped,
+        visits_per_member=visits_per_member,
+        total_valid_visits=total_valid_visits,
         walk_in_count=2,
         top_n=5,
     )
 
+    assert summary["total_valid_visits"] == 3
     assert summary["total_walk_ins"] == 2
     assert summary["top_members"][0]["member_id"] == "m1"
     assert summary["top_members"][0]["visit_count"] == 2
+
+
+def test_write_summary_falls_back_to_json_without_orjson(tmp_path, monkeypatch):
+    monkeypatch.setattr(logic_module, "orjson", None)
+    summary_path = tmp_path / "summary.json"
+    summary = {"total_valid_visits": 3, "top_members": []}
+
+    write_summary(summary_path, summary)
+
+    content = summary_path.read_text(encoding="utf-8")
+    assert json.loads(content) == summary
+    assert content.splitlines()[1] == '  "total_valid_visits": 3,'
+
+
+def test_print_top_members_heading_matches_list(capsys):
+    print_top_members([
+        {"member_id": "m1", "visit_count": 3},
+        {"member_id": "m2", "visit_count": 1},
+    ])
+
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[1] == "Top 2 members by visits:"
+    assert lines[2:4] == ["m1, 3", "m2, 1"]
+
+
+def test_write_summary_writes_indented_json(tmp_path):
+    summary_path = tmp_path / "summary.json"
+    summary = {
+        "total_valid_visits": 3,
+        "top_members": [{"member_id": "m1", "visit_count": 2}],
+    }
+
+    write_summary(summary_path, summary)
+
+    content = summary_path.read_text(encoding="utf-8")
+    assert json.loads(content) == summary
+    assert content.splitlines()[1] == '  "total_valid_visits": 3,'
+    assert [p.name for p in tmp_path.iterdir()] == ["summary.json"]
+
+
+def test_run_pipeline_writes_output_and_summary(tmp_path):
+    members_path = tmp_path / "members.csv"
+    visits_path = tmp_path / "visits.csv"
+    output_path = tmp_path / "out" / "output.csv"
+    summary_path = tmp_path / "out" / "summary.json"
+    write_csv(members_path, ["member_id", "barcode"], [["m1", "b1"], ["m2", "b2"], ["m1", "b3"]])
+    write_csv(
+        visits_path,
+        ["visit_id", "barcode", "reservation_id"],
+        [
+            ["v1", "b1", ""],
+            ["v2", "b2", "r2"],
+            ["v3", "b1", "r3"],
+            ["v4", "b3", ""],
+            ["v5", "unknown", ""],  # invalid unknown barcode
+            ["v6", "", "r6"],  # invalid missing barcode
+        ],
+    )
+
+    summary = run_pipeline(members_path, visits_path, output_path, summary_path, top_n=1)
+
+    assert output_path.read_text(encoding="utf-8").splitlines() == [
+        "member_id,barcode,visits",
+        "m1,b1,[v1, v3]",
+        "m1,b3,[v4]",
+        "m2,b2,[v2]",
+    ]
+    assert summary["total_valid_visits"] == 4
+    assert summary["total_walk_ins"] == 2
+    assert summary["top_members"] == [{"member_id": "m1", "visit_count": 3}]
+    assert json.loads(summary_path.read_text(encoding="utf-8")) == summary